@@ -453,6 +453,11 @@ class CapellaPolarionWorker:
             validated_new_attachments.extend(prepared)
 
         if validated_new_attachments:
+            data_model.PngConvertedSvgAttachment.convert_batch(
+                attachment
+                for attachment in validated_new_attachments
+                if isinstance(attachment, data_model.PngConvertedSvgAttachment)
+            )
             self.project_client.work_items.attachments.create(
                 validated_new_attachments
             )
@@ -488,6 +493,11 @@ class CapellaPolarionWorker:
                 if att.file_name:
                     attachments_for_update[att.file_name] = att
 
+        data_model.PngConvertedSvgAttachment.convert_batch(
+            attachment
+            for attachment in attachments_for_update.values()
+            if isinstance(attachment, data_model.PngConvertedSvgAttachment)
+        )
         for file_name, attachment in attachments_for_update.items():
             # SVGs should only be updated if their PNG differs
             if (
@@ -4,17 +4,21 @@
 
 from __future__ import annotations
 
-import base64
+import collections
+import collections.abc as cabc
+import concurrent.futures
 import dataclasses
 import hashlib
-import json
 import logging
+import os
 import typing as t
+import weakref
 
 import cairosvg
 import polarion_rest_api_client as polarion_api
+import pydantic
 from capellambse import model
-from capellambse_context_diagrams import context
+from capellambse_context_diagrams import _elkjs, context
 
 from capella2polarion import errors
 
@@ -32,12 +36,123 @@ __all__ = [
 ]
 
 
+_ELK_CHILD_ATTRS: dict[type, tuple[str, ...]] = {
+    _elkjs.ELKInputData: ("children", "edges"),
+    _elkjs.ELKInputChild: ("children", "edges", "ports"),
+    _elkjs.ELKInputPort: (),
+    _elkjs.ELKInputEdge: (),
+}
+"""Traversed child collections per elk input type.
+
+Labels are deliberately missing as they inherit styleclasses from
+their parents. Types not listed here are probed via ``getattr``.
+"""
+
+_failed_render_uuids: set[str] = set()
+"""UUIDs of diagrams whose elk input and render both failed.
+
+Sibling attachments of such diagrams skip straight to the error
+checksum instead of spending a full render attempt again.
+"""
+
+_SVG_RENDER_CACHE_SIZE = 256
+_svg_render_cache: collections.OrderedDict[
+    tuple[t.Any, ...], tuple[weakref.ref, bytes]
+] = collections.OrderedDict()
+
+
+def _render_svg_cached(
+    diagram: model.AbstractDiagram, render_params: dict[str, t.Any]
+) -> bytes:
+    """Render a diagram as SVG bytes, reusing previous render results.
+
+    The cache is keyed on the diagram identity and the render
+    parameters, so several attachments materializing the same diagram
+    render it only once. Diagrams are referenced weakly to not keep
+    models alive; unhashable render parameters bypass the cache.
+    """
+    entry = None
+    try:
+        key = (
+            id(diagram),
+            diagram.uuid,
+            tuple(sorted(render_params.items())),
+        )
+        entry = _svg_render_cache.get(key)
+    except TypeError:
+        key = None
+    if entry is not None and entry[0]() is diagram:
+        assert key is not None
+        _svg_render_cache.move_to_end(key)
+        return entry[1]
+
+    diagram_svg = diagram.render("svg", **render_params)
+    if isinstance(diagram_svg, str):
+        diagram_svg = diagram_svg.encode("utf8")
+    if key is not None:
+        try:
+            _svg_render_cache[key] = (weakref.ref(diagram), diagram_svg)
+        except TypeError:
+            pass
+        else:
+            while len(_svg_render_cache) > _SVG_RENDER_CACHE_SIZE:
+                _svg_render_cache.popitem(last=False)
+    return diagram_svg
+
+
+_PNG_CACHE_SIZE = 256
+_png_cache: collections.OrderedDict[bytes, bytes] = collections.OrderedDict()
+
+
+def _svg_to_png_cached(svg: bytes) -> bytes:
+    """Convert SVG bytes to PNG, reusing conversions of identical SVGs.
+
+    The cache is keyed on a short digest of the SVG content, so
+    diagrams which render identically are rasterized only once.
+    """
+    key = hashlib.blake2b(svg, digest_size=16).digest()
+    if (png := _png_cache.get(key)) is not None:
+        _png_cache.move_to_end(key)
+        return png
+    png = cairosvg.svg2png(svg)
+    _png_cache[key] = png
+    while len(_png_cache) > _PNG_CACHE_SIZE:
+        _png_cache.popitem(last=False)
+    return png
+
+
+_list_adapters: dict[type, pydantic.TypeAdapter] = {}
+
+
+def _list_adapter(item_type: type) -> pydantic.TypeAdapter:
+    """Return a cached TypeAdapter serializing lists of ``item_type``."""
+    if (adapter := _list_adapters.get(item_type)) is None:
+        adapter = _list_adapters[item_type] = pydantic.TypeAdapter(
+            list[item_type]  # type: ignore[valid-type]
+        )
+    return adapter
+
+
+def _content_digest(buf: bytes | None) -> str:
+    """Return a constant-size digest for the given content buffer."""
+    if not buf:
+        return ""
+    return hashlib.blake2b(buf, digest_size=16).hexdigest()
+
+
+_ERROR_IMAGE_CHECKSUM = _content_digest(errors.ERROR_IMAGE)
+"""Precomputed checksum of the static error image."""
+
+
 def calculate_content_checksum(
     attachment: polarion_api.WorkItemAttachment,
 ) -> str:
     """Calculate content checksum for an attachment."""
     try:
-        return base64.b64encode(attachment.content_bytes or b"").decode("utf8")
+        buf = attachment.content_bytes
+        if buf is errors.ERROR_IMAGE:
+            return _ERROR_IMAGE_CHECKSUM
+        return _content_digest(buf)
     except Exception as e:
         logger.error(
             "Failed to read content bytes for attachment %s of WorkItem %s.",
@@ -48,23 +163,55 @@ def calculate_content_checksum(
         return errors.RENDER_ERROR_CHECKSUM
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Capella2PolarionAttachment(polarion_api.WorkItemAttachment):
     """Stub Base-Class for Capella2Polarion attachments."""
 
     _checksum: str | None = None
+    _checksum_cache: tuple[bytes | None, str] | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def content_checksum(self) -> str:
-        """Calculate the checksum for the content of the attachment."""
-        if self._checksum is None:
-            self._checksum = calculate_content_checksum(self)
-        return self._checksum
+        """Calculate the checksum for the content of the attachment.
+
+        The result is cached together with the content buffer it was
+        computed from, so repeated comparisons against the same buffer
+        don't re-hash it, while a hit requires that exact buffer to
+        still be the content. Failure results stick in ``_checksum`` so
+        a broken render is attempted (and logged) only once per
+        instance.
+        """
+        if self._checksum is not None:
+            return self._checksum
+        try:
+            buf = self.content_bytes
+        except Exception as e:
+            logger.error(
+                "Failed to read content bytes for attachment %s of WorkItem"
+                " %s.",
+                self.file_name,
+                self.work_item_id,
+                exc_info=e,
+            )
+            self._checksum = errors.RENDER_ERROR_CHECKSUM
+            return self._checksum
+        if buf is errors.ERROR_IMAGE:
+            return _ERROR_IMAGE_CHECKSUM
+        cached = self._checksum_cache
+        if cached is not None and cached[0] is buf:
+            return cached[1]
+        checksum = _content_digest(buf)
+        self._checksum_cache = (buf, checksum)
+        return checksum
 
 
 class CapellaDiagramAttachment(Capella2PolarionAttachment):
     """A class for lazy loading content_bytes for diagram attachments."""
 
+    __slots__ = ("_content_bytes", "diagram", "render_params")
+
     def __init__(
         self,
         diagram: model.AbstractDiagram,
@@ -87,13 +234,11 @@ class CapellaDiagramAttachment(Capella2PolarionAttachment):
     @property
     def content_bytes(self) -> bytes | None:
         """Diagrams are only rendered, if content_bytes are requested."""
-        if self._content_bytes:
-            return self._content_bytes
-        diagram_svg = self.diagram.render("svg", **self.render_params)
-        if isinstance(diagram_svg, str):
-            diagram_svg = diagram_svg.encode("utf8")
-        self._content_bytes = diagram_svg
-        return diagram_svg
+        if self._content_bytes is None:
+            self._content_bytes = _render_svg_cached(
+                self.diagram, self.render_params
+            )
+        return self._content_bytes
 
     @content_bytes.setter
     def content_bytes(self, value: bytes | None) -> None:
@@ -107,6 +252,8 @@ class CapellaContextDiagramAttachment(CapellaDiagramAttachment):
     content. This will speed up the checksum calculation a lot.
     """
 
+    __slots__ = ("_styleclass_cache",)
+
     def __init__(
         self,
         diagram: context.ContextDiagram,
@@ -115,123 +262,162 @@ class CapellaContextDiagramAttachment(CapellaDiagramAttachment):
         title: str,
     ):
         super().__init__(diagram, file_name, render_params, title)
+        self._styleclass_cache: dict[str, str | None] = {}
 
     @property
     def content_checksum(self) -> str:
         """Return checksum based on elk input for ContextDiagrams else None."""
         if self._checksum is None:
+            if self.diagram.uuid in _failed_render_uuids:
+                return errors.RENDER_ERROR_CHECKSUM
             try:
                 elk_input = self.diagram.elk_input_data(self.render_params)
-                if isinstance(elk_input, tuple):
-                    input_data, edges_or_list = elk_input
-                    if isinstance(edges_or_list, list):
-                        input_str = (
-                            input_data.model_dump_json(exclude_defaults=True)
-                            + ";"
-                            + ";".join(
-                                edge.model_dump_json(exclude_defaults=True)
-                                for edge in edges_or_list
+                input_data, edges = self._normalize_elk(elk_input)
+                # Feed the hasher chunk-wise instead of building one big
+                # intermediate string out of all serialized parts.
+                hasher = hashlib.sha256()
+                hasher.update(
+                    input_data.model_dump_json(exclude_defaults=True).encode()
+                )
+                if edges is not None:
+                    hasher.update(b";")
+                    if isinstance(edges, list):
+                        if edges:
+                            # One batched dump crosses the pydantic-core
+                            # boundary once instead of once per edge.
+                            adapter = _list_adapter(type(edges[0]))
+                            hasher.update(
+                                adapter.dump_json(edges, exclude_defaults=True)
                             )
-                        )
                     else:
-                        input_str = ";".join(
-                            obj.model_dump_json(exclude_defaults=True)
-                            for obj in elk_input
+                        hasher.update(
+                            edges.model_dump_json(
+                                exclude_defaults=True
+                            ).encode()
                         )
-                else:
-                    input_str = elk_input.model_dump_json(
-                        exclude_defaults=True
-                    )
-
-                styleclass_map = self._build_styleclass_map(elk_input)
-                styleclass_str = json.dumps(
-                    styleclass_map, sort_keys=True, separators=(",", ":")
+
+                styleclass_pairs = self._collect_styleclasses(
+                    input_data, edges
                 )
-                self._checksum = hashlib.sha256(
-                    f"{input_str};{styleclass_str}".encode()
-                ).hexdigest()
-            except Exception as e:
-                logger.error(
+                styleclass_pairs.sort()
+                hasher.update(b";")
+                previous = None
+                for uuid, styleclass in styleclass_pairs:
+                    if uuid == previous:
+                        continue
+                    previous = uuid
+                    hasher.update(uuid.encode())
+                    hasher.update(b":")
+                    hasher.update(styleclass.encode())
+                    hasher.update(b",")
+                self._checksum = hasher.hexdigest()
+            except Exception:
+                # No traceback here - only the final fallback failure
+                # in the base property logs with full exception info.
+                logger.warning(
                     "Failed to get elk_input for attachment %s of WorkItem %s."
                     " Using content checksum instead.",
                     self.file_name,
                     self.work_item_id,
-                    exc_info=e,
                 )
-                return super().content_checksum
+                checksum = super().content_checksum
+                if checksum == errors.RENDER_ERROR_CHECKSUM:
+                    _failed_render_uuids.add(self.diagram.uuid)
+                self._checksum = checksum
+                return checksum
         return self._checksum
 
-    def _build_styleclass_map(self, elk_input: t.Any) -> dict[str, str]:
-        """Build a mapping of all UUIDs to their styleclasses.
+    @staticmethod
+    def _normalize_elk(elk_input: t.Any) -> tuple[t.Any, t.Any]:
+        """Split elk input into its input data and optional edges part.
 
-        Only includes ports, children (elements), and edges. Labels are
-        excluded as they inherit styleclasses from their parents.
+        The edges part is either a list of edges, another elk input
+        tree or ``None`` if the input came without a second element.
         """
-        styleclass_map: dict[str, str] = {}
         if isinstance(elk_input, tuple):
-            input_data = elk_input[0]
-            if len(elk_input) > 1:
-                edges_or_list = elk_input[1]
-                if isinstance(edges_or_list, list):
-                    for edge in edges_or_list:
-                        if (
-                            hasattr(edge, "id")
-                            and edge.id
-                            and (styleclass := self._get_styleclass(edge.id))
-                        ):
-                            styleclass_map[edge.id] = styleclass
-                else:
-                    self._extract_uuids_recursive(
-                        edges_or_list, styleclass_map
-                    )
-        else:
-            input_data = elk_input
+            return elk_input[0], elk_input[1] if len(elk_input) > 1 else None
+        return elk_input, None
 
-        self._extract_uuids_recursive(input_data, styleclass_map)
-        return styleclass_map
+    def _collect_styleclasses(
+        self, input_data: t.Any, edges: t.Any
+    ) -> list[tuple[str, str]]:
+        """Collect (UUID, styleclass) pairs for all elk elements.
 
-    def _extract_uuids_recursive(
-        self, elk_data: t.Any, styleclass_map: dict[str, str]
+        Only includes ports, children (elements), and edges. Labels are
+        excluded as they inherit styleclasses from their parents. The
+        pairs are collected into a plain list - duplicates are cheap
+        thanks to the styleclass memoization and get skipped after the
+        final sort - avoiding per-insert dict hashing during the walk.
+        """
+        styleclass_pairs: list[tuple[str, str]] = []
+        if isinstance(edges, list):
+            for edge in edges:
+                if (edge_id := getattr(edge, "id", None)) and (
+                    styleclass := self._get_styleclass(edge_id)
+                ):
+                    styleclass_pairs.append((edge_id, styleclass))
+        elif edges is not None:
+            self._extract_uuids(edges, styleclass_pairs)
+
+        self._extract_uuids(input_data, styleclass_pairs)
+        return styleclass_pairs
+
+    def _extract_uuids(
+        self, elk_data: t.Any, styleclass_pairs: list[tuple[str, str]]
     ) -> None:
-        if hasattr(elk_data, "id") and elk_data.id:
-            styleclass = self._get_styleclass(elk_data.id)
-            if styleclass:
-                styleclass_map[elk_data.id] = styleclass
-
-        if hasattr(elk_data, "children"):
-            for child in elk_data.children:
-                self._extract_uuids_recursive(child, styleclass_map)
-
-        if hasattr(elk_data, "ports"):
-            for port in elk_data.ports:
-                if hasattr(port, "id") and port.id:
-                    styleclass = self._get_styleclass(port.id)
-                    if styleclass:
-                        styleclass_map[port.id] = styleclass
-
-        if hasattr(elk_data, "edges"):
-            for edge in elk_data.edges:
-                if hasattr(edge, "id") and edge.id:
-                    styleclass = self._get_styleclass(edge.id)
-                    if styleclass:
-                        styleclass_map[edge.id] = styleclass
+        """Walk the elk tree iteratively to avoid deep Python recursion.
+
+        This loop is interpreter-bound and runs once per elk node, so
+        the hot lookups are bound to locals up front.
+        """
+        stack = [elk_data]
+        pop = stack.pop
+        extend = stack.extend
+        append = styleclass_pairs.append
+        known_child_attrs = _ELK_CHILD_ATTRS.get
+        get_styleclass = self._get_styleclass
+        while stack:
+            node = pop()
+            child_attrs = known_child_attrs(type(node))
+            if child_attrs is None:
+                # Unknown node type - probe its structure generically.
+                node_id = getattr(node, "id", None)
+                child_attrs = ("children", "ports", "edges")
+                children = [getattr(node, attr, ()) for attr in child_attrs]
+            else:
+                node_id = node.id
+                children = [getattr(node, attr) for attr in child_attrs]
+
+            if node_id and (styleclass := get_styleclass(node_id)):
+                append((node_id, styleclass))
+            for collection in children:
+                extend(collection)
 
     def _get_styleclass(self, uuid: str) -> str | None:
         """Return the style-class string from a given UUID.
 
         This mirrors the logic from the context diagram serializer's
-        get_styleclass method.
+        get_styleclass method. Results are memoized per instance since
+        the same UUID usually appears multiple times in the elk input.
         """
+        if uuid in self._styleclass_cache:
+            return self._styleclass_cache[uuid]
+
+        styleclass: str | None
         try:
             melodyobj = self.diagram._model.by_uuid(uuid)
         except KeyError:
-            if not uuid.startswith("__"):
-                return None
-            return uuid[2:].split(":", 1)[0]
+            if uuid.startswith("__"):
+                styleclass = uuid[2:].split(":", 1)[0]
+            else:
+                styleclass = None
         else:
             if isinstance(melodyobj, model.Diagram):
-                return melodyobj.type.value
-            return melodyobj._get_styleclass()
+                styleclass = melodyobj.type.value
+            else:
+                styleclass = melodyobj._get_styleclass()
+        self._styleclass_cache[uuid] = styleclass
+        return styleclass
 
 
 class PngConvertedSvgAttachment(Capella2PolarionAttachment):
@@ -243,6 +429,8 @@ class PngConvertedSvgAttachment(Capella2PolarionAttachment):
     diagram rendering as long as context_bytes aren't requested.
     """
 
+    __slots__ = ("_content_bytes", "_svg_attachment")
+
     def __init__(self, attachment: polarion_api.WorkItemAttachment):
         assert attachment.mime_type == SVG_MIME_TYPE, (
             "PngConvertedSvgAttachment must be initialized using SVG attachment"
@@ -254,18 +442,86 @@ class PngConvertedSvgAttachment(Capella2PolarionAttachment):
             attachment.title,
             None,
             PNG_MIME_TYPE,
-            f"{attachment.file_name[:-3]}png",
+            attachment.file_name.removesuffix("svg") + "png",
         )
         self._content_bytes: bytes | None = None
-        self._svg_attachment = attachment
+        self._svg_attachment: polarion_api.WorkItemAttachment | None = (
+            attachment
+        )
+
+    @classmethod
+    def convert_batch(
+        cls,
+        attachments: cabc.Iterable[PngConvertedSvgAttachment],
+        workers: int | None = None,
+    ) -> None:
+        """Convert the SVGs of all given attachments to PNGs at once.
+
+        cairosvg is CPU-bound and barely releases the GIL, so bulk
+        conversions are spread over a process pool. Attachments which
+        are already converted or whose SVG is found in the conversion
+        cache are skipped, and a single pending conversion is done
+        in-process to avoid the pool overhead. SVGs which haven't been
+        rendered yet are left alone and convert lazily on upload, so
+        batching never forces a diagram render.
+        """
+        pending: dict[bytes, tuple[bytes, list[PngConvertedSvgAttachment]]]
+        pending = {}
+        for attachment in attachments:
+            if attachment._content_bytes is not None:
+                continue
+            svg_attachment = attachment._svg_attachment
+            assert svg_attachment is not None
+            if isinstance(svg_attachment, CapellaDiagramAttachment):
+                svg = svg_attachment._content_bytes
+            else:
+                svg = svg_attachment.content_bytes
+            if not svg:
+                continue
+            key = hashlib.blake2b(svg, digest_size=16).digest()
+            if (png := _png_cache.get(key)) is not None:
+                _png_cache.move_to_end(key)
+                attachment._content_bytes = png
+                attachment._svg_attachment = None
+                continue
+            pending.setdefault(key, (svg, []))[1].append(attachment)
+
+        if not pending:
+            return
+        if len(pending) == 1:
+            ((svg, targets),) = pending.values()
+            png = _svg_to_png_cached(svg)
+            for attachment in targets:
+                attachment._content_bytes = png
+                attachment._svg_attachment = None
+            return
+
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            futures = {
+                key: pool.submit(cairosvg.svg2png, svg)
+                for key, (svg, _) in pending.items()
+            }
+            for key, future in futures.items():
+                png = future.result()
+                _png_cache[key] = png
+                for attachment in pending[key][1]:
+                    attachment._content_bytes = png
+                    attachment._svg_attachment = None
+        while len(_png_cache) > _PNG_CACHE_SIZE:
+            _png_cache.popitem(last=False)
 
     @property
     def content_bytes(self) -> bytes | None:
         """The content bytes are created from the SVG when requested."""
-        if not self._content_bytes:
-            self._content_bytes = cairosvg.svg2png(
-                self._svg_attachment.content_bytes
-            )
+        if self._content_bytes is None:
+            assert self._svg_attachment is not None
+            svg = self._svg_attachment.content_bytes
+            assert svg is not None, "The SVG attachment has no content"
+            self._content_bytes = _svg_to_png_cached(svg)
+            # The SVG reference isn't needed anymore once the PNG
+            # exists; drop it so its buffer can be reclaimed.
+            self._svg_attachment = None
         return self._content_bytes
 
     @content_bytes.setter
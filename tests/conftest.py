@@ -18,6 +18,7 @@ from capellambse import model as m
 
 from capella2polarion import cli, data_model
 from capella2polarion.connectors import polarion_repo, polarion_worker
+from capella2polarion.data_model import work_item_attachments
 from capella2polarion.elements import (
     converter_config,
     data_session,
@@ -59,6 +60,16 @@ TEST_NAMESPACE = m.Namespace(
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_failed_render_uuids():
+    """Reset the render-failure cache between tests.
+
+    Diagrams poisoned by one test must not short-circuit checksum
+    calculation for the same diagram in later tests.
+    """
+    work_item_attachments._failed_render_uuids.clear()
+
+
 @pytest.fixture
 def diagram_cache_index() -> list[dict[str, t.Any]]:
     """Return the test diagram cache index."""
@@ -1,6 +1,5 @@
 # Copyright DB InfraGO AG and contributors
 # SPDX-License-Identifier: Apache-2.0
-import base64
 import hashlib
 import json
 from unittest import mock
@@ -31,7 +30,7 @@ WI_CONTEXT_DIAGRAM_CHECKSUM = (
     "0ed1417e8e4717524bc91162dcf8633afca686e93f8b036d0bc48d81f0444f56"
 )
 CONTEXT_DIAGRAM_CHECKSUM = (
-    "4da324a05b0162bb2d51c956e0cfa3f6fd4a6c44f0f9b9db03389fa9bc084841"
+    "438163523ed6c284f1bcf66d77880a6f653f1032df50146812f01ae6ac27b713"
 )
 
 TEST_DIAG_UUID = "_APOQ0QPhEeynfbzU12yy7w"
@@ -43,9 +42,9 @@ with open(TEST_DIAGRAM_CACHE / f"{TEST_DIAG_UUID}.svg", "rb") as f:
 wia_dict = {
     "work_item_id": WORKITEM_ID,
     "title": "Diagram",
-    "content_bytes": base64.b64encode(cairosvg.svg2png(diagram_svg)).decode(
-        "utf8"
-    ),
+    "content_bytes": hashlib.blake2b(
+        cairosvg.svg2png(diagram_svg), digest_size=16
+    ).hexdigest(),
     "mime_type": "image/png",
     "file_name": "__C2P__diagram.png",
 }
@@ -616,6 +615,33 @@ def test_diagram_delete_attachments(
     assert work_item.checksum == DIAGRAM_CHECKSUM
 
 
+def test_png_converted_svg_attachment_convert_batch():
+    svgs = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{i}0" '
+        'height="10"/>'.encode()
+        for i in (1, 2, 3)
+    ]
+    attachments = [
+        data_model.PngConvertedSvgAttachment(
+            polarion_api.WorkItemAttachment(
+                WORKITEM_ID,
+                "",
+                "test",
+                content_bytes=svg,
+                mime_type="image/svg+xml",
+                file_name=f"__C2P__diagram_{i}.svg",
+            )
+        )
+        for i, svg in enumerate(svgs)
+    ]
+
+    data_model.PngConvertedSvgAttachment.convert_batch(attachments, workers=2)
+
+    for attachment, svg in zip(attachments, svgs, strict=True):
+        assert attachment.content_bytes == cairosvg.svg2png(svg)
+        assert attachment.mime_type == "image/png"
+
+
 def test_attached_image_in_description_with_caption(
     model: capellambse.MelodyModel,
     worker: polarion_worker.CapellaPolarionWorker,